@@ -1,169 +1,317 @@
+import io
 import os
 import re
+import asyncio
+import argparse
+import json
 import csv
-import requests
+import shelve
+import time
+import functools
+import sys
+from pathlib import Path
+import httpx
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 from dotenv import load_dotenv
 import openai
 import spacy
 from rdflib import Graph, Namespace, URIRef, Literal
 from pyvis.network import Network
+# populate_network is shared with the graph scripts in scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+from _pyvis_common import populate_network
 from docx import Document
 
 def load_paragraph_from_docx(filepath):
     doc = Document(filepath)
-    full_text = "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
-    return full_text.strip()
-
-# Load spaCy model
-nlp = spacy.load("en_core_web_sm")
+    full_text = io.StringIO()
+    for para in doc.paragraphs:
+        text = para.text
+        if text.strip():
+            full_text.write(text)
+            full_text.write("\n")
+    return full_text.getvalue().strip()
+
+# Load spaCy model lazily — only tok2vec + parser are needed for sentence boundaries
+@functools.lru_cache(maxsize=1)
+def get_nlp():
+    return spacy.load("en_core_web_sm", exclude=["tagger", "attribute_ruler", "lemmatizer", "ner"])
+
+# The SDK retries 429/5xx/connection errors with exponential backoff and honours Retry-After
+MAX_RETRIES = 2  # i.e. up to 3 attempts per request
+
+# Create the OpenAI client on first use (API key from .env)
+@functools.lru_cache(maxsize=1)
+def get_client():
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found")
+    return openai.AsyncOpenAI(api_key=api_key, max_retries=MAX_RETRIES)
+
+# Real-time workers, each with one GPT request in flight; this is the only concurrency cap, so keep it under rate limits
+MAX_CONCURRENT_REQUESTS = 10
+# Upper bound on sentences waiting for a worker in real-time mode
+SENTENCE_QUEUE_SIZE = 100
+
+# Batch API polling interval (seconds) for --batch runs
+BATCH_POLL_SECONDS = 30
+
+# Model used for extraction; must support JSON mode (response_format), which plain gpt-4 does not
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+def chat_body(prompt):
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "response_format": {"type": "json_object"},
+        "temperature": 0.0,
+        "top_p": 1.0,
+        "max_tokens": 1024
+    }
 
-# Load API key from .env
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise ValueError("OPENAI_API_KEY not found")
+async def chat(prompt):
+    response = await get_client().chat.completions.create(**chat_body(prompt))
+    return response.choices[0].message.content.strip()
 
-client = openai.OpenAI(api_key=api_key)
+async def run_batch(prompts):
+    """Submit {custom_id: prompt} through the OpenAI Batch API and return {custom_id: reply}."""
+    client = get_client()
+    lines = [
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": chat_body(prompt)})
+        for custom_id, prompt in prompts.items()
+    ]
+    batch_file = await client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    print(f"📦 Submitted batch {batch.id} with {len(lines)} requests")
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        batch = await client.batches.retrieve(batch.id)
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch.id} finished with status: {batch.status}")
+
+    output = await client.files.content(batch.output_file_id)
+    replies = {}
+    for line in output.text.splitlines():
+        item = json.loads(line)
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            print(f"⚠️ Batch request failed: {item['custom_id']}")
+            continue
+        replies[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+    return replies
 
 # Step 1: Split long paragraph into sentences
 def split_sentences(text):
-    doc = nlp(text)
+    doc = get_nlp()(text)
     return [sent.text.strip() for sent in doc.sents]
 
-# Step 2: Resolve coreferences using GPT
-def resolve_coreferences(text):
-    prompt = f"""
-Resolve all coreferences in this paragraph. 
+# Number of preceding sentences sent along as context for resolving references
+CONTEXT_SENTENCES = 2
+
+def sentence_context(sentences, i):
+    return " ".join(sentences[max(0, i - CONTEXT_SENTENCES):i])
+
+# Step 2: Resolve references, simplify and extract triples in one GPT call
+RESOLVE_AND_EXTRACT_PROMPT = """
+Extract RDF-style triples from the sentence below, working in three steps:
+
+1. Resolve all coreferences: replace **all pronouns** (e.g., "he", "she", "it", "they", "his", "her", "their") and **vague references** (e.g., "this", "that", "these", "those", "this event") with the **explicit full entity** they refer to. Use the context only to resolve references; do not extract triples from it.
+2. Split the resolved sentence into short, clear factual statements. Clarify any implied relationships (e.g. link requirements to infrastructure).
+3. Turn every statement into a (subject, predicate, object) triple. Ensure all key entities are connected and no orphaned terms remain.
 
-➡️ Replace **all pronouns** (e.g., "he", "she", "it", "they", "his", "her", "their") and **vague references** (e.g., "this", "that", "these", "those", "this event") with the **explicit full entity** they refer to.
+Use unambiguous, full noun phrases. Respond with JSON only, in the form:
+{{"triples": [["subject", "predicate", "object"], ...]}}
 
-Be precise. Do **not leave any reference unresolved**. The result must be suitable for RDF triple extraction — so use unambiguous, full noun phrases for each reference.
+Context:
+{context}
 
-Text:
+Sentence:
 {text}
 """
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content.strip()
 
-# Step 3: Simplify sentence using GPT
-def simplify_sentence(text):
-    prompt = f"Simplify this sentence into short, clear factual statements suitable for RDF triple extraction. Clarify any implied relationships (e.g. link requirements to infrastructure).\n\nText:\n{text}"
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content.strip()
-
-# Step 4: Extract triples using GPT
-def extract_triples(text):
-    prompt = f"Extract RDF-style triples from this sentence. Output format: (subject, predicate, object). Ensure all key entities are connected and no orphaned terms remain.\n\nText:\n{text}"
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.choices[0].message.content.strip()
+async def resolve_and_extract(text, context=""):
+    return await chat(RESOLVE_AND_EXTRACT_PROMPT.format(text=text, context=context or "(none)"))
 
 
 THESAURUS = {
 
 }
+# Thesaurus keys normalized once, so lookups only need label.lower()
+_THESAURUS = {k.lower().strip(): v for k, v in THESAURUS.items()}
 
-
-def canonicalize_entity(label):
-    norm = label.lower().strip()
-    return THESAURUS.get(norm, label)
+# Compiled once instead of on every label
+_THE_RE = re.compile(r'^the\s+', re.IGNORECASE)
 
 
 def normalize_label(label):
-    label = label.strip()
-    label = re.sub(r'^the\s+', '', label, flags=re.IGNORECASE)
-    label = canonicalize_entity(label)  # 🔄 Apply thesaurus
-    label = label[0].upper() + label[1:] if label else label
-    return label
-
-# Pre-clean GPT lines
-def clean_gpt_output(output):
-    lines = output.strip().splitlines()
-    cleaned = [re.sub(r'^\d+\.\s*', '', line).strip() for line in lines if line.strip()]
-    return cleaned
-
-# Step 5: Parse triples
+    label = _THE_RE.sub('', label.strip())
+    label = _THESAURUS.get(label.lower(), label)  # 🔄 Apply thesaurus
+    return label[:1].upper() + label[1:]
+
+# Step 3: Parse triples from the JSON reply
 def parse_triples(gpt_output):
     triples = []
-    for line in clean_gpt_output(gpt_output):
-        match = re.match(r"\(?\"?([^,\"]+)\"?,\s*\"?([^,\"]+)\"?,\s*\"?([^\"\)]+)\"?\)?", line)
-        if match:
-            subj, pred, obj = match.groups()
+    try:
+        items = json.loads(gpt_output).get("triples", [])
+    except (ValueError, AttributeError):
+        print(f"⚠️ Could not parse GPT output: {gpt_output}")
+        return triples
+    for item in items:
+        if isinstance(item, list) and len(item) == 3 and all(isinstance(x, str) for x in item):
+            subj, pred, obj = item
             subj = normalize_label(subj)
             obj = normalize_label(obj)
             triples.append((subj.strip(), pred.strip(), obj.strip()))
         else:
-            print(f"⚠️ Could not parse line: {line}")
+            print(f"⚠️ Could not parse triple: {item}")
     print("🔍 Extracted (parsed):", triples)
     return triples
 
-def wikidata_lookup(label):
-    url = "https://www.wikidata.org/w/api.php"
+WIKIDATA_URL = "https://www.wikidata.org/w/api.php"
+# Wikidata rate-limits anonymous clients without a descriptive User-Agent
+HTTP_HEADERS = {"User-Agent": "ICT-KG/1.0 (https://github.com/mihahafner/ICT)"}
+# Persistent label -> QID cache shared across runs ("" marks a known miss)
+WIKIDATA_CACHE_FILE = "wikidata_cache.db"
+# Concurrent lookups, multiplexed over a single HTTP/2 connection
+WIKIDATA_CONCURRENCY = 16
+
+# Circuit breaker: after CB_FAILURE_THRESHOLD consecutive failures, skip Wikidata for CB_RESET_SECONDS
+CB_FAILURE_THRESHOLD = 5
+CB_RESET_SECONDS = 30
+_CB = {"fail_count": 0, "open_until": 0.0}
+
+_backoff = wait_exponential(multiplier=1, min=1, max=8)
+# Upper bound on a server-requested Retry-After, so one header can't stall every pending lookup
+RETRY_AFTER_MAX_SECONDS = 60
+
+def _is_transient(exc):
+    # Network/timeout errors, 429 and 5xx may succeed on retry; other 4xx will not
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+def _wait_retry_after(retry_state):
+    # Honour Retry-After on 429s (capped), otherwise back off exponentially
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    if response is not None and response.status_code == 429:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), RETRY_AFTER_MAX_SECONDS)
+    return _backoff(retry_state)
+
+@retry(stop=stop_after_attempt(3), wait=_wait_retry_after,
+       retry=retry_if_exception(_is_transient), reraise=True)
+async def _search_wikidata(http, label):
     params = {
         "action": "wbsearchentities",
         "format": "json",
         "language": "en",
         "search": label
     }
+    r = await http.get(WIKIDATA_URL, params=params)
+    r.raise_for_status()
+    data = r.json()
+    results = data.get("search", [])
+    return results[0]['id'] if results else ""
+
+def _record_wikidata_result(ok):
+    if ok:
+        _CB["fail_count"] = 0
+        return
+    _CB["fail_count"] += 1
+    if _CB["fail_count"] >= CB_FAILURE_THRESHOLD:
+        _CB["open_until"] = time.time() + CB_RESET_SECONDS
+        _CB["fail_count"] = 0
+        print(f"⚠️ Wikidata circuit open for {CB_RESET_SECONDS}s after repeated failures")
+
+async def wikidata_lookup(http, label):
+    """Return the top Wikidata QID for label, "" if there is no match, or None if the request failed."""
+    if time.time() < _CB["open_until"]:
+        return None
 
     try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        data = r.json()
-        results = data.get("search", [])
-        return results[0]['id'] if results else None
-    except requests.exceptions.RequestException as e:
+        qid = await _search_wikidata(http, label)
+    except httpx.HTTPError as e:
         print(f"⚠️ Wikidata request failed: {e}")
+        if not _is_transient(e):
+            return None  # a rejected request says nothing about Wikidata's health
     except ValueError:
         print(f"⚠️ Wikidata returned non-JSON for: {label}")
+    else:
+        _record_wikidata_result(True)
+        return qid
+    _record_wikidata_result(False)
     return None
 
-# Step 7: Build RDF graph and export CSVs
-def build_rdf_graph(triples):
+# Step 4: Link unique labels to Wikidata (disk cache first, then concurrent lookups)
+async def lookup_wikidata_ids(labels):
+    slots = asyncio.Semaphore(WIKIDATA_CONCURRENCY)
+
+    async def bounded_lookup(http, label):
+        async with slots:
+            return await wikidata_lookup(http, label)
+
+    with shelve.open(WIKIDATA_CACHE_FILE) as cache:
+        id_map = {label: cache[label] for label in labels if label in cache}
+        missing = [label for label in labels if label not in id_map]
+        async with httpx.AsyncClient(http2=True, timeout=10, headers=HTTP_HEADERS) as http:
+            qids = await asyncio.gather(*[bounded_lookup(http, label) for label in missing])
+        for label, qid in zip(missing, qids):
+            if qid is not None:
+                cache[label] = qid
+            id_map[label] = qid
+    return {label: qid for label, qid in id_map.items() if qid}
+
+# Step 5: Build RDF graph and export CSVs
+async def build_rdf_graph(triples):
     g = Graph()
     EX = Namespace("http://example.org/")
     WD = Namespace("http://www.wikidata.org/entity/")
     g.bind("ex", EX)
     g.bind("wd", WD)
 
-    rdf_rows = []
-    nodes_set = set()
+    # Repeated sentences yield repeated triples; keep first occurrence for a stable CSV order
+    unique_triples = list(dict.fromkeys(triples))
+    nodes_set = {x for s, _, o in unique_triples for x in (s, o)}
 
-    for s, p, o in triples:
-        s_uri = URIRef(EX[s.replace(" ", "_")])
-        p_uri = URIRef(EX[p.replace(" ", "_")])
-        if " " in o:
-            o_val = Literal(o)
-        else:
-            o_wikidata = wikidata_lookup(o)
-            o_val = URIRef(WD[o_wikidata]) if o_wikidata else Literal(o)
+    unique_objs = list(dict.fromkeys(o for _, _, o in unique_triples if " " not in o))
+    id_map = await lookup_wikidata_ids(unique_objs)
+
+    # Subjects/predicates repeat a lot; build each ex: URI once
+    uri_cache = {}
+    def ex_uri(x):
+        u = uri_cache.get(x)
+        if u is None:
+            u = uri_cache[x] = URIRef(EX[x.replace(" ", "_")])
+        return u
+
+    def object_value(o):
+        o_wikidata = id_map.get(o)
+        return URIRef(WD[o_wikidata]) if o_wikidata else Literal(o)
 
-        g.add((s_uri, p_uri, o_val))
-        rdf_rows.append((s, p, o))
-        nodes_set.update([s, o])
+    # One bulk insert instead of a g.add() per triple
+    g.addN((ex_uri(s), ex_uri(p), object_value(o), g) for s, p, o in unique_triples)
 
     g.serialize(destination="output.ttl", format="turtle")
     print("✅ RDF graph saved as: output.ttl")
 
-    with open("output_triples.csv", "w", newline="") as f:
+    with open("output_triples.csv", "w", newline="", buffering=1 << 20) as f:
         writer = csv.writer(f)
         writer.writerow(["Subject", "Predicate", "Object"])
-        writer.writerows(rdf_rows)
+        writer.writerows(unique_triples)
     print("✅ RDF triples saved as: output_triples.csv")
 
-    with open("output_nodes.csv", "w", newline="") as f:
+    with open("output_nodes.csv", "w", newline="", buffering=1 << 20) as f:
         writer = csv.writer(f)
         writer.writerow(["Entity"])
-        for node in sorted(nodes_set):
-            writer.writerow([node])
+        writer.writerows([node] for node in sorted(nodes_set))
     print("✅ RDF nodes saved as: output_nodes.csv")
 
     print("🔍 All RDF triples:")
@@ -172,40 +320,86 @@ def build_rdf_graph(triples):
 
     return g
 
-# Step 8: Visualize graph including orphans
+# Step 6: Visualize graph
 def visualize_graph(triples, output_file="graph.html"):
     net = Network(directed=True, height='600px', width='100%')
-    all_nodes = set()
+    nodes = {}
+    edges = []
 
+    # Every node comes from a triple, so each one is an edge endpoint — there are no orphans to grey out
     for s, p, o in triples:
-        all_nodes.update([s, o])
-        net.add_node(s, label=s)
-        net.add_node(o, label=o)
-        net.add_edge(s, o, label=p)
-
-    for node in all_nodes:
-        if not any(e for e in net.edges if node in (e['from'], e['to'])):
-            net.add_node(node, label=node, color='gray')
+        nodes.setdefault(s, {"label": s, "color": "#97c2fc"})
+        nodes.setdefault(o, {"label": o, "color": "#97c2fc"})
+        edges.append({"from": s, "to": o, "label": p})
 
+    populate_network(net, nodes, edges)
     net.write_html(output_file)
     print(f"✅ Graph visualization saved to: {output_file}")
 
+# Per-sentence pipeline: one fused GPT call → parse
+async def process_sentence(sentence, context=""):
+    return parse_triples(await resolve_and_extract(sentence, context))
+
+async def process_sentences_realtime(sentences):
+    # MAX_CONCURRENT_REQUESTS workers drain a bounded queue, so at most SENTENCE_QUEUE_SIZE
+    # sentences are pending at once while the API pipeline stays saturated
+    queue = asyncio.Queue(maxsize=SENTENCE_QUEUE_SIZE)
+    results = [None] * len(sentences)
+    errors = []
+
+    async def worker():
+        while True:
+            i, sentence, context = await queue.get()
+            try:
+                results[i] = await process_sentence(sentence, context)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(MAX_CONCURRENT_REQUESTS)]
+    for i, sentence in enumerate(sentences):
+        await queue.put((i, sentence, sentence_context(sentences, i)))
+    await queue.join()
+    for w in workers:
+        w.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+    if errors:
+        raise errors[0]
+    return results
+
+async def process_sentences_batch(sentences):
+    # Offline mode: one Batch API job, results matched back by custom_id
+    replies = await run_batch({
+        f"extract::{i}": RESOLVE_AND_EXTRACT_PROMPT.format(text=s, context=sentence_context(sentences, i) or "(none)")
+        for i, s in enumerate(sentences)
+    })
+    return [parse_triples(replies[f"extract::{i}"]) for i in range(len(sentences)) if f"extract::{i}" in replies]
+
 # MAIN
-if __name__ == "__main__":
+async def main(batch=False):
     docx_path = "Tests/Building_X_Risk_Analysis.docx"  # Change this to match your file location
     paragraph = load_paragraph_from_docx(docx_path)
     #paragraph = "The dog is a domesticated descendant of the gray wolf. Also called the domestic dog, it was selectively bred from a population of wolves during the Late Pleistocene by hunter-gatherers. The dog was the first species to be domesticated by humans, over 14,000 years ago and before the development of agriculture. Due to their long association with humans, dogs have gained the ability to thrive on a starch-rich diet that would be inadequate for other canids."
-    all_triples = []
-    # First resolve coreferences across the whole paragraph
-    resolved_paragraph = resolve_coreferences(paragraph)
-    print("🧠 Resolved paragraph:\n", resolved_paragraph)
-
-    # Then split and process each sentence
-    for sentence in split_sentences(resolved_paragraph):
-        simplified = simplify_sentence(sentence)
-        extracted = extract_triples(simplified)
-        triples = parse_triples(extracted)
-        all_triples.extend(triples)
-
-    build_rdf_graph(all_triples)
+
+    # Split, then resolve + simplify + extract each sentence in a single call
+    sentences = split_sentences(paragraph)
+    if batch:
+        results = await process_sentences_batch(sentences)
+    else:
+        results = await process_sentences_realtime(sentences)
+    all_triples = [t for triples in results for t in triples]
+
+    await build_rdf_graph(all_triples)
     visualize_graph(all_triples, output_file="Tests/KG_graph.html")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract an RDF knowledge graph from a DOCX document.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit GPT requests through the OpenAI Batch API (cheaper, non-interactive)")
+    parser.add_argument("--model", default=MODEL,
+                        help=f"OpenAI chat model to use (default: {MODEL}, or $OPENAI_MODEL)")
+    args = parser.parse_args()
+    MODEL = args.model
+    asyncio.run(main(batch=args.batch))
@@ -1,6 +1,11 @@
 # === semantic_web_style_ontology.py ===
 from owlready2 import *
 from pyvis.network import Network
+import sys
+from pathlib import Path
+# populate_network is shared with the graph scripts in scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+from _pyvis_common import populate_network
 
 # -----------------------------
 # 1) Build a tiny ontology
@@ -68,11 +73,12 @@ def visualize_rdf_edge_style(onto, html_out="Tests/ontology_graph.html",
                  "arrows": { "to": { "enabled": true, "scaleFactor": 0.7 } } }
     }""")
 
-    added = set()
+    nodes, edges = {}, []
     def add_node(nid, label, color):
-        if nid not in added:
-            net.add_node(nid, label=label, color=color)
-            added.add(nid)
+        nodes.setdefault(nid, {"label": label, "color": color})
+
+    def add_edge(src, dst, **opts):
+        edges.append({"from": src, "to": dst, **opts})
 
     # nice labels for literals (units etc.)
     def lit_label(prop, val):
@@ -91,7 +97,7 @@ def visualize_rdf_edge_style(onto, html_out="Tests/ontology_graph.html",
                 for p in c.is_a:
                     if isinstance(p, ThingClass):
                         add_node(p.name, p.name, "lightblue")
-                        net.add_edge(p.name, c.name, label="is_a", color="#8ec7ff")
+                        add_edge(p.name, c.name, label="is_a", color="#8ec7ff")
 
     # 2) Instances (green) + optional instance_of edges
     inst_names = {i.name for i in onto.individuals()}
@@ -101,7 +107,7 @@ def visualize_rdf_edge_style(onto, html_out="Tests/ontology_graph.html",
             for c in i.is_a:
                 if isinstance(c, ThingClass):
                     add_node(c.name, c.name, "lightblue")
-                    net.add_edge(i.name, c.name, label="rdf:type", color="#8ec7ff")
+                    add_edge(i.name, c.name, label="rdf:type", color="#8ec7ff")
 
     # 3) Object-property assertions: instance → instance (edge label = predicate)
     for prop in onto.object_properties():
@@ -109,7 +115,7 @@ def visualize_rdf_edge_style(onto, html_out="Tests/ontology_graph.html",
         for s, o in prop.get_relations():
             add_node(s.name, s.name, "mediumseagreen")
             add_node(o.name, o.name, "mediumseagreen")
-            net.add_edge(s.name, o.name, label=pname)
+            add_edge(s.name, o.name, label=pname)
 
     # 4) Data-property assertions: instance → literal (edge label = predicate)
     for prop in onto.data_properties():
@@ -119,19 +125,21 @@ def visualize_rdf_edge_style(onto, html_out="Tests/ontology_graph.html",
             lit = lit_label(pname, val)
             lit_id = f"lit::{pname}::{s.name}::{lit}"
             add_node(lit_id, lit, "lightgray")
-            net.add_edge(s.name, lit_id, label=pname)
+            add_edge(s.name, lit_id, label=pname)
 
+    populate_network(net, nodes, edges)
     net.write_html(html_out)
     print(f"✅ Visualization (predicates as edges) saved to: {html_out}")
 
 def visualize_tbox_abox(onto, html_out="Tests/ontology_graph_tbox_abox.html"):
     net = Network(height="750px", width="100%", directed=True)
-    added_nodes = set()
+    nodes, edges = {}, []
 
     def add_node(node_id, label, color):
-        if node_id not in added_nodes:
-            net.add_node(node_id, label=label, color=color)
-            added_nodes.add(node_id)
+        nodes.setdefault(node_id, {"label": label, "color": color})
+
+    def add_edge(src, dst, **opts):
+        edges.append({"from": src, "to": dst, **opts})
 
     # ---- TBox (Schema) ----
     for prop in onto.object_properties():
@@ -139,29 +147,30 @@ def visualize_tbox_abox(onto, html_out="Tests/ontology_graph_tbox_abox.html"):
             for range_cls in prop.range:
                 add_node(domain.name, domain.name, "dodgerblue")  # class
                 add_node(range_cls.name, range_cls.name, "dodgerblue")  # class
-                net.add_edge(domain.name, range_cls.name, label=prop.name, color="orange")
+                add_edge(domain.name, range_cls.name, label=prop.name, color="orange")
 
     for prop in onto.data_properties():
         for domain in prop.domain:
             add_node(domain.name, domain.name, "dodgerblue")
             lit_node_id = f"{prop.name}_value"
             add_node(lit_node_id, "Literal", "lightgray")
-            net.add_edge(domain.name, lit_node_id, label=prop.name, color="orange")
+            add_edge(domain.name, lit_node_id, label=prop.name, color="orange")
 
     # ---- ABox (Instances) ----
     for prop in onto.object_properties():
         for s, o in prop.get_relations():
             add_node(s.name, s.name, "mediumseagreen")  # instance
             add_node(o.name, o.name, "mediumseagreen")  # instance
-            net.add_edge(s.name, o.name, label=prop.name, color="#999999")
+            add_edge(s.name, o.name, label=prop.name, color="#999999")
 
     for prop in onto.data_properties():
         for s, val in prop.get_relations():
             add_node(s.name, s.name, "mediumseagreen")
             lit_id = f"{prop.name}::{s.name}::{val}"
             add_node(lit_id, str(val), "lightgray")
-            net.add_edge(s.name, lit_id, label=prop.name, color="#999999")
+            add_edge(s.name, lit_id, label=prop.name, color="#999999")
 
+    populate_network(net, nodes, edges)
     net.write_html(html_out)
     print(f"✅ Visualization saved to {html_out}")
 
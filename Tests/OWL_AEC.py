@@ -4,6 +4,11 @@ from owlready2 import *
 from pyvis.network import Network
 from rdflib import Graph, URIRef
 from pyshacl import validate
+import sys
+from pathlib import Path
+# populate_network is shared with the graph scripts in scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+from _pyvis_common import populate_network
 
 # -----------------------------
 # 0) Output folder
@@ -168,13 +173,14 @@ print("✅ SHACL shapes saved as Tests/fire_safety_shapes.ttl")
 # 4) Run SHACL Validation
 # -----------------------------
 print("🔍 Running SHACL validation...")
-data_graph = Graph()
-data_graph.parse("Tests/fire_safety_aec_data.ttl", format="turtle")
+# ABox is parsed once here and reused by both visualizations below
+abox_graph = Graph()
+abox_graph.parse("Tests/fire_safety_aec_data.ttl", format="turtle")
 shapes_graph = Graph()
 shapes_graph.parse("Tests/fire_safety_shapes.ttl", format="turtle")
 
 conforms, results_graph, results_text = validate(
-    data_graph,
+    abox_graph,
     shacl_graph=shapes_graph,
     inference='rdfs',
     abort_on_first=False,
@@ -187,7 +193,7 @@ print(results_text)
 # -----------------------------
 # 5) Visualize ABox (predicates as edges)
 # -----------------------------
-def visualize_abox_rdf(abox_file, html_out):
+def visualize_abox_rdf(abox_graph, html_out):
     net = Network(directed=True, height="750px", width="100%", bgcolor="white", font_color="black")
     net.set_options("""{
       "physics": { "solver": "forceAtlas2Based", "stabilization": { "iterations": 350 } },
@@ -195,45 +201,45 @@ def visualize_abox_rdf(abox_file, html_out):
       "edges": { "font": { "size": 14, "align": "middle" },
                  "arrows": { "to": { "enabled": true, "scaleFactor": 0.7 } } }
     }""")
-    added = set()
+    nodes, edges = {}, []
 
     def add_node(nid, label, color):
-        if nid not in added:
-            net.add_node(nid, label=label, color=color)
-            added.add(nid)
+        nodes.setdefault(nid, {"label": label, "color": color})
 
-    g = Graph()
-    g.parse(abox_file, format="turtle")
+    def add_edge(src, dst, **opts):
+        edges.append({"from": src, "to": dst, **opts})
 
-    for s, p, o in g:
+    for s, p, o in abox_graph:
         s_lbl = s.split("#")[-1]
         p_lbl = p.split("#")[-1]
         if isinstance(o, URIRef):
             o_lbl = o.split("#")[-1]
             add_node(s_lbl, s_lbl, "mediumseagreen")
             add_node(o_lbl, o_lbl, "mediumseagreen")
-            net.add_edge(s_lbl, o_lbl, label=p_lbl)
+            add_edge(s_lbl, o_lbl, label=p_lbl)
         else:
             lit = str(o)
             lit_id = f"lit::{s_lbl}::{p_lbl}::{lit}"
             add_node(s_lbl, s_lbl, "mediumseagreen")
             add_node(lit_id, lit, "lightgray")
-            net.add_edge(s_lbl, lit_id, label=p_lbl)
+            add_edge(s_lbl, lit_id, label=p_lbl)
 
+    populate_network(net, nodes, edges)
     net.write_html(html_out)
     print(f"✅ ABox visualization saved to: {html_out}")
 
 # -----------------------------
 # 6) Visualize TBox (domain/range) + ABox overlay
 # -----------------------------
-def visualize_tbox_abox(onto, abox_file, html_out):
+def visualize_tbox_abox(onto, abox_graph, html_out):
     net = Network(height="750px", width="100%", directed=True)
-    added = set()
+    nodes, edges = {}, []
 
     def add_node(nid, label, color):
-        if nid not in added:
-            net.add_node(nid, label=label, color=color)
-            added.add(nid)
+        nodes.setdefault(nid, {"label": label, "color": color})
+
+    def add_edge(src, dst, **opts):
+        edges.append({"from": src, "to": dst, **opts})
 
     # TBox schema: class→class edges (orange labels)
     for prop in onto.object_properties():
@@ -241,41 +247,40 @@ def visualize_tbox_abox(onto, abox_file, html_out):
             for rng in prop.range:
                 add_node(domain.name, domain.name, "dodgerblue")
                 add_node(rng.name, rng.name, "dodgerblue")
-                net.add_edge(domain.name, rng.name, label=prop.name, color="orange")
+                add_edge(domain.name, rng.name, label=prop.name, color="orange")
 
     for prop in onto.data_properties():
         for domain in prop.domain:
             add_node(domain.name, domain.name, "dodgerblue")
             lit_node_id = f"{prop.name}_Literal"
             add_node(lit_node_id, "Literal", "lightgray")
-            net.add_edge(domain.name, lit_node_id, label=prop.name, color="orange")
+            add_edge(domain.name, lit_node_id, label=prop.name, color="orange")
 
     # ABox overlay
-    g = Graph()
-    g.parse(abox_file, format="turtle")
-    for s, p, o in g:
+    for s, p, o in abox_graph:
         s_lbl = s.split("#")[-1]
         p_lbl = p.split("#")[-1]
         if isinstance(o, URIRef):
             o_lbl = o.split("#")[-1]
             add_node(s_lbl, s_lbl, "mediumseagreen")
             add_node(o_lbl, o_lbl, "mediumseagreen")
-            net.add_edge(s_lbl, o_lbl, label=p_lbl, color="#999999")
+            add_edge(s_lbl, o_lbl, label=p_lbl, color="#999999")
         else:
             lit = str(o)
             lit_id = f"lit::{s_lbl}::{p_lbl}::{lit}"
             add_node(s_lbl, s_lbl, "mediumseagreen")
             add_node(lit_id, lit, "lightgray")
-            net.add_edge(s_lbl, lit_id, label=p_lbl, color="#999999")
+            add_edge(s_lbl, lit_id, label=p_lbl, color="#999999")
 
+    populate_network(net, nodes, edges)
     net.write_html(html_out)
     print(f"✅ TBox+ABox visualization saved to: {html_out}")
 
 # -----------------------------
 # 7) Run both visualizations
 # -----------------------------
-visualize_abox_rdf("Tests/fire_safety_aec_data.ttl", "Tests/ontology_graph_abox.html")
-visualize_tbox_abox(onto, "Tests/fire_safety_aec_data.ttl", "Tests/ontology_graph_tbox_abox.html")
+visualize_abox_rdf(abox_graph, "Tests/ontology_graph_abox.html")
+visualize_tbox_abox(onto, abox_graph, "Tests/ontology_graph_tbox_abox.html")
 
 print("Open:")
 print(" - Tests/ontology_graph_abox.html")
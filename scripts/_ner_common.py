@@ -0,0 +1,183 @@
+import os
+import zlib
+import colorsys
+import functools
+from collections import deque
+import docx
+import numpy as np
+import spacy
+from spacy.attrs import HEAD
+from synonyms_terminology import synonym_map
+
+# ===== Device =====
+# Runs tok2vec/parser/ner on the GPU when CUDA is available; has to happen before spacy.load
+USE_GPU = spacy.prefer_gpu()
+if USE_GPU:
+    print("⚡ Using GPU for spaCy")
+
+# ===== nlp.pipe settings =====
+# On GPU: bigger batches keep the device busy, and a single process (extra workers would each copy the model into VRAM)
+BATCH_SIZE = 128 if USE_GPU else 64
+N_PROCESS = 1 if USE_GPU else max(1, (os.cpu_count() or 1) - 1)
+
+# ===== Custom ICT terms, tagged as TECHNOLOGY entities during the main parse =====
+custom_terms = [
+    "GDPR", "TCP/IP", "HTTP", "HTTPS", "5G", "AI", "Artificial Intelligence",
+    "Machine Learning", "Deep Learning", "Kubernetes", "Docker", "Neo4j",
+    "Data Lake", "Data Warehouse", "ETL", "ELT", "MLOps", "IoT",
+    "Cloud Computing", "AWS", "Azure", "Google Cloud"
+]
+
+# ===== Shared spaCy model =====
+# Loaded once per process, so both graph stages reuse it when run from main.py.
+# The full default pipeline is kept (the relation stage needs lemmas); callers that
+# need less pass disable=[...] to nlp()/nlp.pipe() instead.
+@functools.lru_cache(maxsize=1)
+def get_nlp():
+    nlp = spacy.load("en_core_web_lg")
+    # Matched on lowercase tokens, so terms are found case-insensitively
+    ruler = nlp.add_pipe("entity_ruler", before="ner", config={"phrase_matcher_attr": "LOWER"})
+    ruler.add_patterns([{"label": "TECHNOLOGY", "pattern": t} for t in custom_terms])
+    return nlp
+
+# ===== Q&A loading =====
+def iter_qa(file_path):
+    # Yield (question, answer) pairs while walking the paragraphs, without keeping a list of them
+    doc = docx.Document(file_path)
+
+    def texts():
+        for p in doc.paragraphs:
+            text = p.text.strip()
+            if text:
+                yield text
+
+    def is_question(text):
+        return text.lower().startswith("q:") or text.lower().startswith("question")
+
+    # any() stops at the first labelled question, so this pre-check is usually short
+    if any(is_question(text) for text in texts()):
+        current_q = None
+        for text in texts():
+            if is_question(text):
+                current_q = text
+            elif text.lower().startswith("a:") or text.lower().startswith("answer"):
+                if current_q:
+                    yield current_q, text
+                    current_q = None
+    else:
+        # Unlabelled document: consecutive paragraphs pair up as question, answer
+        current_q = None
+        for text in texts():
+            if current_q is None:
+                current_q = text
+            else:
+                yield current_q, text
+                current_q = None
+
+# ===== Entities =====
+ENTITY_LABELS = {"ORG", "PRODUCT", "GPE", "LAW", "EVENT", "TECHNOLOGY"}
+
+def extract_entities(doc):
+    # Custom terms arrive as TECHNOLOGY entities from the entity_ruler
+    return [ent for ent in doc.ents if ent.label_ in ENTITY_LABELS]
+
+@functools.lru_cache(maxsize=4096)
+def normalize_entity(ent_text):
+    ent_clean = ent_text.strip()
+    if ent_clean.lower().startswith("the "):
+        ent_clean = ent_clean[4:]  # remove leading 'the '
+    return synonym_map.get(ent_clean.lower(), ent_clean)
+
+# ===== Parsing =====
+def analyse_qa_pairs(nlp, qa_pairs, analyse, **pipe_kwargs):
+    """Yield (idx, analyse(doc)) for every Q&A pair in order, parsing each distinct "Q A" text once.
+
+    Repeated blocks are not sent to nlp.pipe again; they reuse the result of their first occurrence.
+    """
+    seen = set()
+    results = {}
+    repeats = deque()  # (idx, block) of repeats, in order, waiting for their turn
+
+    def unique_blocks():
+        for idx, (q, a) in enumerate(qa_pairs, start=1):
+            block = f"{q} {a}"
+            if block in seen:
+                repeats.append((idx, block))
+            else:
+                seen.add(block)
+                yield block, idx
+
+    for doc, idx in nlp.pipe(unique_blocks(), as_tuples=True, **pipe_kwargs):
+        # Any repeat numbered before this block already had its first occurrence analysed
+        while repeats and repeats[0][0] < idx:
+            repeat_idx, block = repeats.popleft()
+            yield repeat_idx, results[block]
+        results[doc.text] = analyse(doc)
+        yield idx, results[doc.text]
+    for repeat_idx, block in repeats:
+        yield repeat_idx, results[block]
+
+# ===== Dependency distance =====
+MAX_DEP_DISTANCE = 3
+
+def parse_tree(doc):
+    """Return (heads, depths) lists: absolute head index and steps to the sentence root for every token."""
+    # to_array gives head offsets relative to each token (negative values come back wrapped as uint64)
+    heads = np.arange(len(doc), dtype=np.int64) + doc.to_array(HEAD).astype(np.int64)
+    depths = np.zeros(len(doc), dtype=np.int32)
+    ptr = np.arange(len(doc), dtype=np.int64)
+    # Move every token one step up per iteration until all have reached their root (heads[root] == root)
+    moving = heads[ptr] != ptr
+    while moving.any():
+        depths += moving
+        ptr = heads[ptr]
+        moving = heads[ptr] != ptr
+    return heads.tolist(), depths.tolist()
+
+def dependency_distance(tree, i, j):
+    # Path length between tokens i and j through their lowest common ancestor, None across sentences
+    heads, depths = tree
+    dist = 0
+    while depths[i] > depths[j]:
+        i = heads[i]
+        dist += 1
+    while depths[j] > depths[i]:
+        j = heads[j]
+        dist += 1
+    while i != j:
+        if heads[i] == i:
+            return None  # two different sentence roots
+        i, j = heads[i], heads[j]
+        dist += 2
+    return dist
+
+# ===== Graph colouring =====
+def connected_components(nodes, edges):
+    """Group nodes into connected components (edge direction ignored) using flat int32 arrays."""
+    nodes = list(nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    src = np.fromiter((index[u] for u, _ in edges), dtype=np.int32)
+    dst = np.fromiter((index[v] for _, v in edges), dtype=np.int32)
+    # Every node starts as its own label; each round pulls the smaller label across every edge,
+    # then pointer-jumps (labels[labels]) so long chains collapse in a few rounds
+    labels = np.arange(len(nodes), dtype=np.int32)
+    while True:
+        new = labels.copy()
+        np.minimum.at(new, src, labels[dst])
+        np.minimum.at(new, dst, labels[src])
+        new = new[new]
+        if np.array_equal(new, labels):
+            break
+        labels = new
+    groups = {}
+    for node, label in zip(nodes, labels.tolist()):
+        groups.setdefault(label, []).append(node)
+    return list(groups.values())
+
+def component_color(component):
+    # Hue from a stable hash of the member names (built-in hash() is salted per process),
+    # fixed lightness/saturation so every cluster stays readable on white
+    key = "\x1f".join(sorted(component)).encode("utf-8")
+    hue = (zlib.crc32(key) & 0xFFFF) / 0xFFFF
+    r, g, b = colorsys.hls_to_rgb(hue, 0.55, 0.6)
+    return "#%02x%02x%02x" % (int(r * 255), int(g * 255), int(b * 255))
@@ -0,0 +1,15 @@
+# Shared by the graph scripts here and the prototypes in Tests/
+# Writes pyvis Network internals directly, so it is tied to the version pinned in requirements.txt (0.3.2)
+
+def populate_network(net, nodes, edges):
+    """Fill a pyvis Network from {node_id: options} and edge dicts in one assignment.
+
+    Equivalent to add_node/add_edge per item (same dot shape, font colour and arrows),
+    without their per-call scans of the node id list.
+    """
+    font = {"font": {"color": net.font_color}} if net.font_color else {}
+    net.nodes = [{"shape": "dot", **font, **opts, "id": nid} for nid, opts in nodes.items()]
+    net.node_ids = list(nodes)
+    net.node_map = {n["id"]: n for n in net.nodes}
+    arrows = {"arrows": "to"} if net.directed else {}
+    net.edges = [{**arrows, **e} for e in edges]
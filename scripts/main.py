@@ -1,12 +1,13 @@
-import subprocess
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
-BASE_DIR = Path(__file__).resolve().parent.parent
+# Stages are imported once here and run in-process or in a worker pool below
+import synonyms_terminology
+import qa_QA_ner_graph
+import relation_extraction_graph
+from _ner_common import USE_GPU, N_PROCESS
 
-# Paths to scripts
-synonyms_script = BASE_DIR / "scripts" / "synonyms_terminology.py"
-cooccurrence_script = BASE_DIR / "scripts" / "qa_QA_ner_graph.py"
-relation_script = BASE_DIR / "scripts" / "relation_extraction_graph.py"
+BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Output files
 process_dir = BASE_DIR / "process_data"
@@ -19,13 +20,25 @@ REL_HTML = visuals_dir / "relations_entities_graph.html"
 
 if __name__ == "__main__":
     print("🔄 Step 1: Running synonym & terminology normalization...")
-    subprocess.run(["python", str(synonyms_script)], check=True)
+    synonyms_terminology.main()
 
+    # Steps 2 and 3 both read the cleaned document and write separate outputs, so they can run side by side
     print("📊 Step 2: Running co-occurrence entity graph (NER-based)...")
-    subprocess.run(["python", str(cooccurrence_script)], check=True)
-
     print("🔍 Step 3: Running relationship extraction graph...")
-    subprocess.run(["python", str(relation_script)], check=True)
+    if USE_GPU:
+        # CUDA is already initialised in this process and does not survive a fork; run the stages in turn
+        qa_QA_ner_graph.main()
+        relation_extraction_graph.main()
+    else:
+        # Each stage runs its own nlp.pipe workers; split the budget so together they stay at one per core
+        n_process = max(1, N_PROCESS // 2)
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            stages = [
+                executor.submit(qa_QA_ner_graph.main, n_process),
+                executor.submit(relation_extraction_graph.main, n_process),
+            ]
+            for stage in stages:
+                stage.result()
 
     print("\n✅ Workflow complete! Outputs generated:\n")
     print(f"📄 NER CSV: {NER_CSV.resolve()}")
@@ -1,19 +1,13 @@
-import re
-import spacy
-import docx
+import numpy as np
 import pandas as pd
-from itertools import combinations
 from pyvis.network import Network
 from pathlib import Path
 import networkx as nx
-import random
-from synonyms_terminology import synonym_map
-
-def normalize_entity(ent_text):
-    ent_clean = ent_text.strip()
-    if ent_clean.lower().startswith("the "):
-        ent_clean = ent_clean[4:]  # remove leading 'the '
-    return synonym_map.get(ent_clean.lower(), ent_clean)
+from _ner_common import (
+    get_nlp, iter_qa, analyse_qa_pairs, extract_entities, normalize_entity, parse_tree, dependency_distance,
+    connected_components, component_color, BATCH_SIZE, N_PROCESS, MAX_DEP_DISTANCE,
+)
+from _pyvis_common import populate_network
 
 # ===== Paths =====
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,115 +21,106 @@ HTML_FILE = VISUALS_DIR / "qa_entities_graph.html"
 PROCESS_DIR.mkdir(exist_ok=True)
 VISUALS_DIR.mkdir(exist_ok=True)
 
-MAX_DEP_DISTANCE = 3
+# Only ents, sentences and the dependency tree are used here — POS tags and lemmas are not
+UNUSED_PIPES = ["tagger", "attribute_ruler", "lemmatizer"]
 
 # ===== Load spaCy model =====
-nlp = spacy.load("en_core_web_lg")
-
-custom_terms = [
-    "GDPR", "TCP/IP", "HTTP", "HTTPS", "5G", "AI", "Artificial Intelligence",
-    "Machine Learning", "Deep Learning", "Kubernetes", "Docker", "Neo4j",
-    "Data Lake", "Data Warehouse", "ETL", "ELT", "MLOps", "IoT",
-    "Cloud Computing", "AWS", "Azure", "Google Cloud"
-]
-custom_pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in custom_terms) + r")\b", re.IGNORECASE)
-
-def load_qa_from_docx(file_path):
-    doc = docx.Document(file_path)
-    qa_list = []
-    paras = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-    has_labels = any(p.lower().startswith("q:") or p.lower().startswith("question") for p in paras)
-    if has_labels:
-        current_q, current_a = None, None
-        for text in paras:
-            if text.lower().startswith("q:") or text.lower().startswith("question"):
-                current_q = text
-            elif text.lower().startswith("a:") or text.lower().startswith("answer"):
-                current_a = text
-                if current_q:
-                    qa_list.append((current_q, current_a))
-                    current_q, current_a = None, None
-    else:
-        for i in range(0, len(paras), 2):
-            if i + 1 < len(paras):
-                qa_list.append((paras[i], paras[i+1]))
-    return qa_list
-
-def extract_entities(text):
-    doc = nlp(text)
-    ents = {ent for ent in doc.ents if ent.label_ in ["ORG", "PRODUCT", "GPE", "LAW", "EVENT", "TECHNOLOGY"]}
-    for match in custom_pattern.findall(text):
-        match_doc = nlp(match.strip())
-        if match_doc.ents:
-            ents.add(match_doc.ents[0])
-    return list(ents)
-
-def dependency_distance(token1, token2):
-    try:
-        visited = set()
-        queue = [(token1, 0)]
-        while queue:
-            node, dist = queue.pop(0)
-            if node == token2:
-                return dist
-            visited.add(node)
-            neighbors = list(node.children) + ([node.head] if node.head != node else [])
-            for n in neighbors:
-                if n not in visited:
-                    queue.append((n, dist + 1))
-        return None
-    except Exception:
-        return None
-
-def build_graph(qa_list):
-    G = nx.Graph()
+nlp = get_nlp()
+
+def entity_records(doc):
+    """Return a Q&A block's (normalized text, sentence start, root token index) entity records and its parse tree."""
+    ents = extract_entities(doc)
+    ents = list({ent.text.strip(): ent for ent in ents}.values())
+    if len(ents) < 2:
+        # Nothing to pair: skip the sentence lookups and the parse tree export
+        return [(normalize_entity(ent.text), None, None) for ent in ents], None
+    return [(normalize_entity(ent.text), ent.sent.start, ent.root.i) for ent in ents], parse_tree(doc)
+
+def build_edge_frame(entities, trees):
+    # Every entity pair within a Q&A block, in the order combinations() over each block would give
+    pairs = entities.merge(entities, on="qa_idx", suffixes=("1", "2"))
+    pairs = pairs[pairs["pos1"] < pairs["pos2"]].sort_values(["qa_idx", "pos1", "pos2"], kind="stable")
+
+    # Same-sentence pairs are kept only when their roots are close in the dependency tree
+    same_sent = (pairs["sent1"] == pairs["sent2"]).to_numpy()
+    near = np.zeros(len(pairs), dtype=bool)
+    if same_sent.any():
+        near[same_sent] = [
+            dist is not None and dist <= MAX_DEP_DISTANCE
+            for dist in (
+                dependency_distance(trees[qa_idx], root1, root2)
+                for qa_idx, root1, root2 in pairs.loc[same_sent, ["qa_idx", "root1", "root2"]].itertuples(index=False)
+            )
+        ]
+    strong = same_sent & near
+    keep = strong | ~same_sent
+    pairs = pairs[keep]
+    strong = strong[keep]
+
+    q_label = pairs["qa_idx"].astype(str)
+    return pd.DataFrame({
+        "Entity1": pairs["norm1"],
+        "Entity2": pairs["norm2"],
+        "title": np.where(strong, f"Strong: Dep-path ≤{MAX_DEP_DISTANCE} in Q" + q_label, "Weak: Co-occurs in Q" + q_label),
+    })
+
+def build_graph(qa_list, n_process=N_PROCESS):
     all_entities = set()
-
-    for idx, (q, a) in enumerate(qa_list, start=1):
-        doc = nlp(f"{q} {a}")
-        ents = extract_entities(f"{q} {a}")
-        ents = list({ent.text.strip(): ent for ent in ents}.values())
-
-        ents_norm = [normalize_entity(ent.text) for ent in ents]
-        for ent in ents_norm:
-            all_entities.add(ent)
-
-        for i in range(len(ents_norm)):
-            for j in range(i + 1, len(ents_norm)):
-                if ents[i].sent == ents[j].sent:
-                    dist = dependency_distance(ents[i].root, ents[j].root)
-                    if dist is not None and dist <= MAX_DEP_DISTANCE:
-                        G.add_edge(ents_norm[i], ents_norm[j], title=f"Strong: Dep-path ≤{MAX_DEP_DISTANCE} in Q{idx}")
-                else:
-                    G.add_edge(ents_norm[i], ents_norm[j], title=f"Weak: Co-occurs in Q{idx}")
+    idx = 0
+
+    # Parse distinct Q&A blocks in batches across worker processes; repeated blocks reuse their first result
+    # Entities are collected column-wise (struct of arrays) and paired in bulk afterwards
+    columns = {"qa_idx": [], "pos": [], "norm": [], "sent": [], "root": []}
+    trees = {}
+    results = analyse_qa_pairs(nlp, qa_list, entity_records,
+                               batch_size=BATCH_SIZE, n_process=n_process, disable=UNUSED_PIPES)
+    for idx, (records, tree) in results:
+        all_entities.update(norm for norm, _, _ in records)
+        if len(records) < 2:
+            continue
+        trees[idx] = tree
+        for pos, (norm, sent, root) in enumerate(records):
+            columns["qa_idx"].append(idx)
+            columns["pos"].append(pos)
+            columns["norm"].append(norm)
+            columns["sent"].append(sent)
+            columns["root"].append(root)
+
+    edges = build_edge_frame(pd.DataFrame(columns), trees)
+    G = nx.from_pandas_edgelist(edges, "Entity1", "Entity2", edge_attr="title")
+
+    print(f"📄 Parsed {idx} Q&A pairs.")
 
     for entity in all_entities:
         if entity not in G.nodes():
             G.add_node(entity)
 
-    components = list(nx.connected_components(G))
+    components = connected_components(G.nodes(), G.edges())
     cluster_colors = {}
     for comp in components:
-        color = f"#{random.randint(0, 0xFFFFFF):06x}"
+        color = component_color(comp)
         for node in comp:
             cluster_colors[node] = color
 
     net = Network(height="750px", width="100%", bgcolor="white", font_color="black")
-    for node in G.nodes():
-        net.add_node(node, label=node, color=cluster_colors[node])
-    for e1, e2, data in G.edges(data=True):
-        net.add_edge(e1, e2, title=data.get("title", ""))
+    populate_network(
+        net,
+        {node: {"label": node, "color": cluster_colors[node]} for node in G.nodes()},
+        [{"from": e1, "to": e2, "title": data.get("title", "")} for e1, e2, data in G.edges(data=True)]
+    )
 
     return net, list(G.edges())
 
-if __name__ == "__main__":
+def main(n_process=N_PROCESS):
     if not QA_FILE.exists():
         print(f"❌ Cleaned Q&A file not found: {QA_FILE}")
         exit(1)
-    qa_list = load_qa_from_docx(QA_FILE)
-    print(f"📄 Loaded {len(qa_list)} Q&A pairs from cleaned document.")
-    net, edges = build_graph(qa_list)
+    print("📄 Streaming Q&A pairs from cleaned document.")
+    net, edges = build_graph(iter_qa(QA_FILE), n_process)
     pd.DataFrame(edges, columns=["Entity1", "Entity2"]).to_csv(CSV_FILE, index=False)
     net.save_graph(str(HTML_FILE))
     print(f"✅ NER Graph saved to {HTML_FILE}")
     print(f"✅ Edges saved to {CSV_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,13 @@
-import re
-import spacy
-import docx
 import pandas as pd
 from pathlib import Path
 from pyvis.network import Network
 import networkx as nx
-import random
 from itertools import combinations
-from synonyms_terminology import synonym_map
-
-def normalize_entity(ent_text):
-    ent_clean = ent_text.strip()
-    if ent_clean.lower().startswith("the "):
-        ent_clean = ent_clean[4:]  # remove leading 'the '
-    return synonym_map.get(ent_clean.lower(), ent_clean)
+from _ner_common import (
+    get_nlp, iter_qa, analyse_qa_pairs, extract_entities, normalize_entity, parse_tree, dependency_distance,
+    connected_components, component_color, BATCH_SIZE, N_PROCESS, MAX_DEP_DISTANCE,
+)
+from _pyvis_common import populate_network
 
 # ===== Paths =====
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,18 +21,8 @@ HTML_FILE = VISUALS_DIR / "relations_entities_graph.html"
 PROCESS_DIR.mkdir(exist_ok=True)
 VISUALS_DIR.mkdir(exist_ok=True)
 
-MAX_DEP_DISTANCE = 3
-
 # ===== Load spaCy model =====
-nlp = spacy.load("en_core_web_lg")
-
-custom_terms = [
-    "GDPR", "TCP/IP", "HTTP", "HTTPS", "5G", "AI", "Artificial Intelligence",
-    "Machine Learning", "Deep Learning", "Kubernetes", "Docker", "Neo4j",
-    "Data Lake", "Data Warehouse", "ETL", "ELT", "MLOps", "IoT",
-    "Cloud Computing", "AWS", "Azure", "Google Cloud"
-]
-custom_pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in custom_terms) + r")\b", re.IGNORECASE)
+nlp = get_nlp()
 
 RELATION_PATTERNS = {
     "is_a": {"be", "is", "are", "was", "were", "constitute", "represent"},
@@ -47,122 +31,105 @@ RELATION_PATTERNS = {
     "based_on": {"base", "build", "derive", "depend", "develop"},
     "part_of": {"part", "component", "element", "segment", "member", "belong"}
 }
+# Verb lemma -> relation label, so each token needs one lookup
+LEMMA_TO_REL = {verb: rel_label for rel_label, verbs in RELATION_PATTERNS.items() for verb in verbs}
 
-def load_qa_from_docx(file_path):
-    doc = docx.Document(file_path)
-    qa_list = []
-    paras = [p.text.strip() for p in doc.paragraphs if p.text.strip()]
-    has_labels = any(p.lower().startswith("q:") or p.lower().startswith("question") for p in paras)
-    if has_labels:
-        current_q, current_a = None, None
-        for text in paras:
-            if text.lower().startswith("q:") or text.lower().startswith("question"):
-                current_q = text
-            elif text.lower().startswith("a:") or text.lower().startswith("answer"):
-                current_a = text
-                if current_q:
-                    qa_list.append((current_q, current_a))
-                    current_q, current_a = None, None
-    else:
-        for i in range(0, len(paras), 2):
-            if i + 1 < len(paras):
-                qa_list.append((paras[i], paras[i+1]))
-    return qa_list
-
-def dependency_distance(token1, token2):
-    try:
-        visited = set()
-        queue = [(token1, 0)]
-        while queue:
-            node, dist = queue.pop(0)
-            if node == token2:
-                return dist
-            visited.add(node)
-            neighbors = list(node.children) + ([node.head] if node.head != node else [])
-            for n in neighbors:
-                if n not in visited:
-                    queue.append((n, dist + 1))
-        return None
-    except Exception:
-        return None
-
-def extract_entities(text):
-    doc = nlp(text)
-    ents = {ent for ent in doc.ents if ent.label_ in ["ORG", "PRODUCT", "GPE", "LAW", "EVENT", "TECHNOLOGY"]}
-    for match in custom_pattern.findall(text):
-        match_doc = nlp(match.strip())
-        if match_doc.ents:
-            ents.add(match_doc.ents[0])
-    return list(ents)
-
-def extract_relations_in_sentence(sent):
+def extract_relations_in_sentence(sent, tree):
     relations = []
     ents_in_sent = [ent for ent in sent.ents]
     if len(ents_in_sent) < 2:
         return relations
+    # Relation labels found in the sentence, ordered by the last verb that triggered them
+    rels = {}
     for token in sent:
-        for rel_label, verbs in RELATION_PATTERNS.items():
-            if token.lemma_.lower() in verbs:
-                for e1, e2 in combinations(ents_in_sent, 2):
-                    dist = dependency_distance(e1.root, e2.root)
-                    if dist is not None and dist <= MAX_DEP_DISTANCE:
-                        relations.append((e1.text, rel_label, e2.text))
+        rel_label = LEMMA_TO_REL.get(token.lemma_.lower())
+        if rel_label is not None:
+            rels.pop(rel_label, None)
+            rels[rel_label] = None
+    if not rels:
+        return relations
+    for e1, e2 in combinations(ents_in_sent, 2):
+        dist = dependency_distance(tree, e1.root.i, e2.root.i)
+        if dist is not None and dist <= MAX_DEP_DISTANCE:
+            relations.extend((e1.text, rel_label, e2.text) for rel_label in rels)
     return relations
 
-def build_graph_with_relations(qa_list):
+def relation_candidates(doc):
+    """Return a Q&A block's normalized entities, its verb relations and its cross-sentence entity pairs."""
+    ents_all = extract_entities(doc)
+    ents_all = list({ent.text.strip(): ent for ent in ents_all}.values())
+    ents_norm = [normalize_entity(ent.text) for ent in ents_all]
+    # No sentence can hold a pair (relation pass uses all of sent.ents) and there are no cross-sentence pairs
+    if len(doc.ents) < 2:
+        return ents_norm, [], []
+
+    # Strong edges: same sentence + dep distance + verb pattern
+    tree = parse_tree(doc)
+    relations = [
+        (normalize_entity(e1), rel, normalize_entity(e2))
+        for sent in doc.sents
+        for e1, rel, e2 in extract_relations_in_sentence(sent, tree)
+    ]
+
+    # Weak edges: different sentences in same Q&A
+    sent_starts = [ent.sent.start for ent in ents_all]
+    cross_sentence = [
+        (ents_norm[i], ents_norm[j])
+        for i, j in combinations(range(len(ents_norm)), 2)
+        if sent_starts[i] != sent_starts[j]
+    ]
+    return ents_norm, relations, cross_sentence
+
+def build_graph_with_relations(qa_list, n_process=N_PROCESS):
     G = nx.DiGraph()
     all_entities = set()
+    idx = 0
 
-    for idx, (q, a) in enumerate(qa_list, start=1):
-        text_block = f"{q} {a}"
-        doc = nlp(text_block)
-
-        ents_all = extract_entities(text_block)
-        ents_all = list({ent.text.strip(): ent for ent in ents_all}.values())
-        ents_norm = [normalize_entity(ent.text) for ent in ents_all]
+    # Parse distinct Q&A blocks in batches across worker processes; repeated blocks reuse their first result
+    results = analyse_qa_pairs(nlp, qa_list, relation_candidates, batch_size=BATCH_SIZE, n_process=n_process)
+    for idx, (entities, relations, cross_sentence) in results:
+        all_entities.update(entities)
+        for e1, rel, e2 in relations:
+            G.add_edge(e1, e2, label=rel)
+        for e1, e2 in cross_sentence:
+            if not G.has_edge(e1, e2):
+                G.add_edge(e1, e2, label="co_occurs")
 
-        for ent in ents_norm:
-            all_entities.add(ent)
-
-        # Strong edges: same sentence + dep distance + verb pattern
-        for sent in doc.sents:
-            for e1, rel, e2 in extract_relations_in_sentence(sent):
-                G.add_edge(normalize_entity(e1), normalize_entity(e2), label=rel)
-
-        # Weak edges: different sentences in same Q&A
-        for i in range(len(ents_norm)):
-            for j in range(i + 1, len(ents_norm)):
-                if ents_all[i].sent != ents_all[j].sent:
-                    if not G.has_edge(ents_norm[i], ents_norm[j]):
-                        G.add_edge(ents_norm[i], ents_norm[j], label="co_occurs")
+    print(f"📄 Parsed {idx} Q&A pairs.")
 
     for entity in all_entities:
         if entity not in G.nodes():
             G.add_node(entity)
 
-    components = list(nx.weakly_connected_components(G))
+    components = connected_components(G.nodes(), G.edges())
     cluster_colors = {}
     for comp in components:
-        color = f"#{random.randint(0, 0xFFFFFF):06x}"
+        color = component_color(comp)
         for node in comp:
             cluster_colors[node] = color
 
     net = Network(height="750px", width="100%", bgcolor="white", font_color="black", directed=True)
-    for node in G.nodes():
-        net.add_node(node, label=node, color=cluster_colors[node])
-    for e1, e2, data in G.edges(data=True):
-        net.add_edge(e1, e2, title=data.get("label", ""), label=data.get("label", ""))
+    populate_network(
+        net,
+        {node: {"label": node, "color": cluster_colors[node]} for node in G.nodes()},
+        [
+            {"from": e1, "to": e2, "title": data.get("label", ""), "label": data.get("label", "")}
+            for e1, e2, data in G.edges(data=True)
+        ]
+    )
 
     return net, [(e1, data["label"], e2) for e1, e2, data in G.edges(data=True)]
 
-if __name__ == "__main__":
+def main(n_process=N_PROCESS):
     if not QA_FILE.exists():
         print(f"❌ Cleaned Q&A file not found: {QA_FILE}")
         exit(1)
-    qa_list = load_qa_from_docx(QA_FILE)
-    print(f"📄 Loaded {len(qa_list)} Q&A pairs from cleaned document.")
-    net, relations = build_graph_with_relations(qa_list)
+    print("📄 Streaming Q&A pairs from cleaned document.")
+    net, relations = build_graph_with_relations(iter_qa(QA_FILE), n_process)
     pd.DataFrame(relations, columns=["Entity1", "Relation", "Entity2"]).to_csv(CSV_FILE, index=False)
     net.save_graph(str(HTML_FILE))
     print(f"✅ Relationship Graph saved to {HTML_FILE}")
     print(f"✅ Relations CSV saved to {CSV_FILE}")
+
+if __name__ == "__main__":
+    main()
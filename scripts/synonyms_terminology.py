@@ -1,4 +1,6 @@
+import os
 import re
+import pickle
 from docx import Document
 from pathlib import Path
 
@@ -6,6 +8,9 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 INPUT_FILE = BASE_DIR / "input_data" / "ICT_toppics.docx"
 OUTPUT_FILE = BASE_DIR / "process_data" / "ICT_toppics_expresions_edit.docx"
+CACHE_FILE = BASE_DIR / "process_data" / "synonym_map.pkl"
+# Bump whenever build_synonym_map or its regexes change, so maps built by older code are not served
+CACHE_VERSION = 2
 
 OUTPUT_FILE.parent.mkdir(exist_ok=True)
 
@@ -39,50 +44,135 @@ manual_synonyms = {
     "edpb": "EDPB",
 }
 
+# ===== Acronym patterns =====
+_RE_FULL_ACR = re.compile(r"\b([A-Z][A-Za-z ]{2,})\s*\(([A-Z]{2,})\)")  # Full form (ACRONYM)
+_RE_ACR_FULL = re.compile(r"\b([A-Z]{2,})\s*\(([A-Z][A-Za-z ]{2,})\)")  # ACRONYM (Full form)
+
 def build_synonym_map(doc):
     """Extract acronym–full form pairs from the document."""
     synonym_map = dict(manual_synonyms)  # Start with manual entries
-    
+
+    def add_pair(full_form, acronym):
+        canonical = acronym if PREFER_ABBREVIATION else full_form
+        synonym_map[full_form.lower()] = canonical
+        synonym_map[acronym.lower()] = canonical
+
     for para in doc.paragraphs:
         text = para.text.strip()
         if not text:
             continue
-        
-        # Full form (ACRONYM)
-        match1 = re.findall(r"\b([A-Z][A-Za-z ]{2,})\s*\(([A-Z]{2,})\)", text)
-        for full_form, acronym in match1:
-            canonical = acronym if PREFER_ABBREVIATION else full_form
-            synonym_map[full_form.lower()] = canonical
-            synonym_map[acronym.lower()] = canonical
-
-        # ACRONYM (Full form)
-        match2 = re.findall(r"\b([A-Z]{2,})\s*\(([A-Z][A-Za-z ]{2,})\)", text)
-        for acronym, full_form in match2:
-            canonical = acronym if PREFER_ABBREVIATION else full_form
-            synonym_map[full_form.lower()] = canonical
-            synonym_map[acronym.lower()] = canonical
+
+        taken = []
+        for m in _RE_FULL_ACR.finditer(text):
+            add_pair(m.group(1), m.group(2))
+            taken.append(m.span())
+
+        # Skip "ACRONYM (Full form)" hits overlapping a text span the first pattern already used
+        for m in _RE_ACR_FULL.finditer(text):
+            if any(start < m.end() and m.start() < end for start, end in taken):
+                continue
+            add_pair(m.group(2), m.group(1))
 
     return synonym_map
 
+def build_synonym_pattern(terms, flags=0):
+    """Compile all terms into one alternation, longest first so phrases win over their parts."""
+    alternation = "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"\b({alternation})\b", flags)
+
 def replace_synonyms_in_doc(doc, synonym_map):
     """Replace synonyms in all paragraphs."""
+    lookup = {term.lower(): canonical for term, canonical in synonym_map.items()}
+    if not lookup:
+        return doc
+    # Match lowercase keys against a lowercase view of the text, so the regex never has to case-fold
+    pattern = build_synonym_pattern(lookup)
+    caseless = None
+
+    def find_matches(text):
+        nonlocal caseless
+        # (start, end, canonical) for every term in text, judged against the whole string
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # Rare: lower() changed the length (e.g. "İ"), so spans would not line up with the original
+            if caseless is None:
+                caseless = build_synonym_pattern(lookup, re.IGNORECASE)
+            return [(m.start(), m.end(), lookup[m.group(0).lower()]) for m in caseless.finditer(text)]
+        return [(m.start(), m.end(), lookup[m.group(0)]) for m in pattern.finditer(lowered)]
+
+    def splice(text, matches, offset=0):
+        parts = []
+        last = 0
+        for start, end, canonical in matches:
+            parts.append(text[last:start - offset])
+            parts.append(canonical)
+            last = end - offset
+        parts.append(text[last:])
+        return "".join(parts)
+
     for para in doc.paragraphs:
-        for term, canonical in synonym_map.items():
-            para.text = re.sub(rf"\b{re.escape(term)}\b", canonical, para.text, flags=re.IGNORECASE)
+        # Word boundaries are judged on the whole paragraph: Word often splits runs mid-word
+        text = para.text
+        matches = find_matches(text)
+        if not matches:
+            continue
+        runs = para.runs
+        # Map each match to the run that holds it entirely; a match across runs can't be rewritten in place
+        spans = []
+        start = 0
+        for run in runs:
+            spans.append((start, start + len(run.text)))
+            start += len(run.text)
+        by_run = {}
+        if start == len(text):  # runs cover the paragraph text (no hyperlinks etc. in between)
+            for match in matches:
+                for i, (run_start, run_end) in enumerate(spans):
+                    if run_start <= match[0] and match[1] <= run_end:
+                        by_run.setdefault(i, []).append(match)
+                        break
+                else:
+                    break
+        if sum(len(found) for found in by_run.values()) == len(matches):
+            # Rewrite only the runs that change, which keeps their formatting and the rest of the XML intact
+            for i, found in by_run.items():
+                new_text = splice(runs[i].text, found, offset=spans[i][0])
+                if new_text != runs[i].text:
+                    runs[i].text = new_text
+        else:
+            new_text = splice(text, matches)
+            if new_text != text:
+                para.text = new_text
     return doc
 
 def get_synonym_map():
-    """Return the synonym map from the INPUT_FILE."""
+    """Return the synonym map from the INPUT_FILE, cached on disk until the file, config or CACHE_VERSION changes."""
     if not INPUT_FILE.exists():
         print(f"❌ Input file not found: {INPUT_FILE}")
         return {}
+
+    stat = INPUT_FILE.stat()
+    key = (CACHE_VERSION, stat.st_mtime_ns, stat.st_size, PREFER_ABBREVIATION, sorted(manual_synonyms.items()))
+    try:
+        with open(CACHE_FILE, "rb") as f:
+            cached_key, cached_map = pickle.load(f)
+        if cached_key == key:
+            return cached_map
+    except Exception:
+        pass  # missing, unreadable or old-format cache: rebuild below
+
     doc = Document(INPUT_FILE)
-    return build_synonym_map(doc)
+    synonym_map = build_synonym_map(doc)
+    # Write to a per-process temp file and swap it in, so concurrent runs never read a partial pickle
+    tmp_file = CACHE_FILE.with_name(f"{CACHE_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp_file, "wb") as f:
+        pickle.dump((key, synonym_map), f)
+    os.replace(tmp_file, CACHE_FILE)
+    return synonym_map
 
 # ===== Create global synonym_map on import =====
 synonym_map = get_synonym_map()
 
-if __name__ == "__main__":
+def main():
     if not INPUT_FILE.exists():
         print(f"❌ Input file not found: {INPUT_FILE}")
         exit(1)
@@ -96,3 +186,6 @@ if __name__ == "__main__":
     # Save cleaned file
     cleaned_doc.save(OUTPUT_FILE)
     print(f"✅ Cleaned document saved to: {OUTPUT_FILE}")
+
+if __name__ == "__main__":
+    main()